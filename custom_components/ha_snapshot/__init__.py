@@ -4,38 +4,114 @@ HA Snapshot integration entry point.
 Defines service registration, panel setup, and main data export/import logic.
 """
 
+import asyncio
 import logging
 import json
+import operator
 import os
+import tempfile
+from collections import defaultdict
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson ships with HA core
+    orjson = None
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant, ServiceCall
-from homeassistant.helpers.device_registry import async_get as async_device_registry
-from homeassistant.helpers.entity_registry import async_get as async_entity_registry
-from homeassistant.helpers.area_registry import async_get as async_area_registry
+from homeassistant.core import Event, HomeAssistant, ServiceCall, callback
+from homeassistant.helpers.device_registry import (
+    EVENT_DEVICE_REGISTRY_UPDATED,
+    async_get as async_device_registry
+)
+from homeassistant.helpers.entity_registry import (
+    EVENT_ENTITY_REGISTRY_UPDATED,
+    async_get as async_entity_registry
+)
+from homeassistant.helpers.area_registry import (
+    EVENT_AREA_REGISTRY_UPDATED,
+    async_get as async_area_registry
+)
 
 from .const import (
     DOMAIN,
+    COMPRESSION_GZIP,
+    COMPRESSION_ZSTD,
+    DATA_EXPORT_CACHE,
+    EXPORT_FORMAT_JSON,
+    EXPORT_FORMAT_MSGPACK,
+    FLOOR_ID,
+    FLOOR_NAME,
     SERVICE_EXPORT_DATA,
     SERVICE_IMPORT_DATA
 )
 
 _LOGGER = logging.getLogger(__name__)
 
+# Coalesce the many small per-device chunks into few large write() syscalls
+_WRITE_BUFFER_SIZE = 1 << 20
+
+# Mode for new snapshots, as open() would create them under the process umask.
+# os.umask() can only be read by setting it, so do that once at import time.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+_SNAPSHOT_FILE_MODE = 0o666 & ~_UMASK
+
+# Shared, immutable "labels" value for the (many) entities without labels, used
+# only while streaming JSON: it serializes as [] just like a fresh list, without
+# allocating one per entity. gather_ha_data still hands out real lists.
+_NO_LABELS = ()
+
+# Yield to the event loop after this many imported entities
+_IMPORT_YIELD_EVERY = 500
+
+# Registry entry fields read for every exported entity, fetched in one C-level call
+_ENTITY_GETTER = operator.attrgetter("entity_id", "name", "options", "disabled_by")
+
 async def async_setup(hass: HomeAssistant, config: dict) -> bool:
     """
-    Legacy entrypoint if someone tries to configure it via YAML.
-    This integration is meant for UI-based config, so we do nothing special here.
+    Runs once per HA start, before any config entry is set up.
+    YAML configuration is not supported; this only registers the services,
+    the panel's static path and the export cache, none of which are per-entry.
     """
     _LOGGER.debug("async_setup called; no YAML support is used.")
+
+    hass.services.async_register(DOMAIN, SERVICE_EXPORT_DATA, handle_export_data)
+    hass.services.async_register(DOMAIN, SERVICE_IMPORT_DATA, handle_import_data)
+    _LOGGER.info("Registered services %s.%s and %s.%s",
+                 DOMAIN, SERVICE_EXPORT_DATA, DOMAIN, SERVICE_IMPORT_DATA)
+
+    # Serve the panel's JS from a static path
+    panel_dir = os.path.join(os.path.dirname(__file__), "panel")
+    hass.http.register_static_path(
+        f"/{DOMAIN}/panel",
+        panel_dir,
+        cache_headers=False
+    )
+
+    # Encoded snapshots keyed by (format, skip_nameless, include_disabled).
+    # Any registry change swaps in a fresh dict, so an export that was already
+    # in flight stores its (possibly stale) result into the discarded one.
+    hass.data[DATA_EXPORT_CACHE] = {}
+
+    @callback
+    def _invalidate_export_cache(event: Event) -> None:
+        hass.data[DATA_EXPORT_CACHE] = {}
+
+    for event_type in (
+        EVENT_DEVICE_REGISTRY_UPDATED,
+        EVENT_ENTITY_REGISTRY_UPDATED,
+        EVENT_AREA_REGISTRY_UPDATED
+    ):
+        hass.bus.async_listen(event_type, _invalidate_export_cache)
+
     return True
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """
     Called when the user adds/integrates HA Snapshot via the UI config flow.
     - We store user preferences (skip_nameless, include_disabled).
-    - Register services if they aren't already.
     - Register a built-in panel at /ha_snapshot for the UI.
+    Services and the panel's static path are registered once in async_setup.
     """
     _LOGGER.info("HA Snapshot: Setting up config entry %s", entry.entry_id)
 
@@ -49,23 +125,6 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         "include_disabled_entities": include_disabled
     }
 
-    # Register services if not already present
-    if not hass.services.has_service(DOMAIN, SERVICE_EXPORT_DATA):
-        hass.services.async_register(DOMAIN, SERVICE_EXPORT_DATA, handle_export_data)
-        _LOGGER.info("Registered service %s.%s", DOMAIN, SERVICE_EXPORT_DATA)
-
-    if not hass.services.has_service(DOMAIN, SERVICE_IMPORT_DATA):
-        hass.services.async_register(DOMAIN, SERVICE_IMPORT_DATA, handle_import_data)
-        _LOGGER.info("Registered service %s.%s", DOMAIN, SERVICE_IMPORT_DATA)
-
-    # Serve the panel's JS from a static path
-    panel_dir = os.path.join(os.path.dirname(__file__), "panel")
-    hass.http.register_static_path(
-        f"/{DOMAIN}/panel",
-        panel_dir,
-        cache_headers=False
-    )
-
     # Create a custom panel in the sidebar.
     # "embed_iframe=False" so the code can directly access `this.hass.callService`.
     hass.components.frontend.async_register_panel(
@@ -93,68 +152,96 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     _LOGGER.info("HA Snapshot: Unloading entry %s", entry.entry_id)
     hass.data[DOMAIN].pop(entry.entry_id, None)
 
+    # Don't hold a (possibly multi-MB) cached snapshot for an unloaded integration
+    hass.data[DATA_EXPORT_CACHE] = {}
+
     # Remove the built-in panel
     hass.components.frontend.async_remove_panel(DOMAIN)
     return True
 
+async def _async_notify(
+    hass: HomeAssistant,
+    title: str,
+    message: str,
+    notification_id: str
+) -> None:
+    """Create (or replace) a persistent notification for the user."""
+    await hass.services.async_call(
+        "persistent_notification",
+        "create",
+        {
+            "title": title,
+            "message": message,
+            "notification_id": notification_id
+        }
+    )
+
 async def handle_export_data(call: ServiceCall) -> None:
     """
     Service: ha_snapshot.export_data
     Args in call.data:
       - notify (bool): Whether to create a persistent notification.
       - filename (str): Output filename in /config/www/.
-    This writes a JSON snapshot to /config/www/<filename>.
+      - format (str): "json" (default) or "msgpack".
+      - compress (bool): gzip the snapshot and write <filename>.gz instead.
+        Implied when filename already ends in ".gz".
+    A filename ending in ".zst" writes a zstandard-compressed snapshot instead.
+    This writes a JSON (or msgpack) snapshot to /config/www/<filename>.
     """
     hass = call.hass
     _LOGGER.debug("export_data called, data=%s", call.data)
 
     notify_user = call.data.get("notify", False)
     filename = call.data.get("filename", "ha_snapshot_data.json")
+    export_format = call.data.get("format", EXPORT_FORMAT_JSON)
+    if filename.endswith(".zst"):
+        compression = COMPRESSION_ZSTD
+    elif call.data.get("compress", False) or filename.endswith(".gz"):
+        compression = COMPRESSION_GZIP
+    else:
+        compression = None
 
     # If multiple config entries exist, pick the first
-    entry_id = next(iter(hass.data[DOMAIN]), None)
-    user_opts = hass.data[DOMAIN].get(entry_id, {}) if entry_id else {}
+    # Services are registered before any entry is set up, so DOMAIN data may be missing
+    entries = hass.data.get(DOMAIN, {})
+    entry_id = next(iter(entries), None)
+    user_opts = entries.get(entry_id, {}) if entry_id else {}
     skip_nameless = user_opts.get("skip_nameless_devices", True)
     include_disabled = user_opts.get("include_disabled_entities", False)
 
     try:
-        data = gather_ha_data(hass, skip_nameless, include_disabled)
+        chunks = await _async_snapshot_chunks(
+            hass, skip_nameless, include_disabled, export_format
+        )
 
-        www_path = hass.config.path("www")
-        if not os.path.exists(www_path):
-            os.makedirs(www_path)
-            _LOGGER.info("Created /config/www folder for snapshot output.")
+        if export_format == EXPORT_FORMAT_MSGPACK:
+            root, ext = os.path.splitext(filename)
+            if ext in ("", ".json"):
+                filename = f"{root}.msgpack"
+        if compression == COMPRESSION_GZIP and not filename.endswith(".gz"):
+            filename = f"{filename}.gz"
 
-        output_file = os.path.join(www_path, filename)
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(data, f, separators=(',', ':'), ensure_ascii=False)
+        output_file = os.path.join(hass.config.path("www"), filename)
+        await hass.async_add_executor_job(_write_snapshot, chunks, output_file, compression)
 
         _LOGGER.info("HA Snapshot: Exported to %s", output_file)
         download_url = f"/local/{filename}"
 
         if notify_user:
-            title = "HA Snapshot Created"
-            message = f"Your snapshot is ready! [Download here]({download_url})"
-            await hass.services.async_call(
-                "persistent_notification",
-                "create",
-                {
-                    "title": title,
-                    "message": message,
-                    "notification_id": f"{DOMAIN}_export"
-                }
+            await _async_notify(
+                hass,
+                "HA Snapshot Created",
+                f"Your snapshot is ready! [Download here]({download_url})",
+                f"{DOMAIN}_export"
             )
     except Exception as e:
         _LOGGER.exception("Export failed: %s", e)
         if notify_user:
-            await hass.services.async_call(
-                "persistent_notification",
-                "create",
-                {
-                    "title": "HA Snapshot Export Error",
-                    "message": f"{e}",
-                    "notification_id": f"{DOMAIN}_export_error"
-                }
+            await _async_notify(
+                hass,
+                "HA Snapshot Export Error",
+                f"{e}",
+                f"{DOMAIN}_export_error"
             )
 
 async def handle_import_data(call: ServiceCall) -> None:
@@ -174,90 +261,89 @@ async def handle_import_data(call: ServiceCall) -> None:
     if not import_json:
         _LOGGER.error("No 'import_json' provided.")
         if notify_user:
-            await hass.services.async_call(
-                "persistent_notification",
-                "create",
-                {
-                    "title": "HA Snapshot Import Error",
-                    "message": "No import_json was provided.",
-                    "notification_id": f"{DOMAIN}_import_error"
-                }
+            await _async_notify(
+                hass,
+                "HA Snapshot Import Error",
+                "No import_json was provided.",
+                f"{DOMAIN}_import_error"
             )
         return
 
     try:
-        parsed = json.loads(import_json)
+        # Large snapshots take a while to parse; keep that off the event loop
+        parsed = await hass.async_add_executor_job(_decode_json, import_json)
     except Exception as e:
         _LOGGER.error("Failed to parse import JSON: %s", e)
         if notify_user:
-            await hass.services.async_call(
-                "persistent_notification",
-                "create",
-                {
-                    "title": "Import Error",
-                    "message": f"JSON parse failed: {e}",
-                    "notification_id": f"{DOMAIN}_import_error"
-                }
+            await _async_notify(
+                hass,
+                "Import Error",
+                f"JSON parse failed: {e}",
+                f"{DOMAIN}_import_error"
             )
         return
 
     entity_registry = async_entity_registry(hass)
+    # Bound once; both are used for every imported entity
+    get_entry = entity_registry.entities.get
+    update_entity = entity_registry.async_update_entity
 
     changes_applied = 0
     changes_skipped = 0
+    # Checked once so the per-entity debug calls cost nothing when debug is off
+    debug = _LOGGER.isEnabledFor(logging.DEBUG)
 
     try:
-        floors = parsed.get("floors", [])
-        for floor in floors:
-            areas = floor.get("areas", [])
-            for area in areas:
-                devices = area.get("devices", [])
-                for dev in devices:
-                    entities = dev.get("entities", [])
-                    for ent in entities:
-                        ent_id = ent.get("entity_id")
-                        if not ent_id:
-                            changes_skipped += 1
-                            continue
-
-                        reg_entry = entity_registry.entities.get(ent_id)
-                        if not reg_entry:
-                            _LOGGER.debug("Entity %s not found in registry; skipping", ent_id)
-                            changes_skipped += 1
-                            continue
-
-                        # Potential updates: name, labels
-                        new_name = ent.get("name")
-                        new_labels = ent.get("labels")
-
-                        updated_args = {}
-                        if new_name and new_name != reg_entry.name:
-                            updated_args["name"] = new_name
-
-                        if new_labels and isinstance(new_labels, list):
-                            # Store them in reg_entry.options[DOMAIN]["labels"]
-                            cur_options = dict(reg_entry.options)
-                            cur_options.setdefault(DOMAIN, {})
-                            cur_options[DOMAIN]["labels"] = new_labels
-                            updated_args["options"] = cur_options
-
-                        if updated_args:
-                            entity_registry.async_update_entity(ent_id, **updated_args)
-                            _LOGGER.debug("Updated %s => %s", ent_id, updated_args)
-                            changes_applied += 1
-                        else:
-                            changes_skipped += 1
+        for seen, ent in enumerate(_iter_import_entities(parsed), 1):
+            # Registry updates must run on the loop; let other work in between
+            if not seen % _IMPORT_YIELD_EVERY:
+                await asyncio.sleep(0)
+
+            ent_id = ent.get("entity_id")
+            if not ent_id:
+                changes_skipped += 1
+                continue
+
+            reg_entry = get_entry(ent_id)
+            if not reg_entry:
+                if debug:
+                    _LOGGER.debug("Entity %s not found in registry; skipping", ent_id)
+                changes_skipped += 1
+                continue
+
+            # Potential updates: name, labels
+            new_name = ent.get("name")
+            new_labels = ent.get("labels")
+
+            updated_args = {}
+            if new_name and new_name != reg_entry.name:
+                updated_args["name"] = new_name
+
+            if new_labels and isinstance(new_labels, list):
+                # Store them in reg_entry.options[DOMAIN]["labels"],
+                # unless they are already there (no registry write then)
+                cur_domain_opts = reg_entry.options.get(DOMAIN) or {}
+                if cur_domain_opts.get("labels") != new_labels:
+                    updated_args["options"] = {
+                        **reg_entry.options,
+                        DOMAIN: {**cur_domain_opts, "labels": new_labels}
+                    }
+
+            if updated_args:
+                update_entity(ent_id, **updated_args)
+                if debug:
+                    _LOGGER.debug("Updated %s => %s", ent_id, updated_args)
+                changes_applied += 1
+            else:
+                changes_skipped += 1
     except Exception as e:
         _LOGGER.exception("Error applying import data: %s", e)
         if notify_user:
-            await hass.services.async_call(
-                "persistent_notification",
-                "create",
-                {
-                    "title": "Import Error",
-                    "message": f"Exception: {e}",
-                    "notification_id": f"{DOMAIN}_import_error"
-                }
+            await _async_notify(
+                hass,
+                "Import Error",
+                f"Exception: {e}",
+                f"{DOMAIN}_import_error"
             )
         return
 
@@ -265,16 +351,134 @@ async def handle_import_data(call: ServiceCall) -> None:
 
     if notify_user:
         msg = f"Import complete! {changes_applied} changes applied, {changes_skipped} skipped."
-        await hass.services.async_call(
-            "persistent_notification",
-            "create",
-            {
-                "title": "HA Snapshot Import",
-                "message": msg,
-                "notification_id": f"{DOMAIN}_import_result"
-            }
+        await _async_notify(
+            hass,
+            "HA Snapshot Import",
+            msg,
+            f"{DOMAIN}_import_result"
         )
 
+def _iter_import_entities(parsed: dict):
+    """
+    Yield every entity dict in an imported floors->areas->devices->entities tree.
+    Missing levels are treated as empty.
+    """
+    return (
+        ent
+        for floor in parsed.get("floors", ())
+        for area in floor.get("areas", ())
+        for dev in area.get("devices", ())
+        for ent in dev.get("entities", ())
+    )
+
+def _encode_json(data) -> bytes:
+    """Serialize data to compact UTF-8 JSON bytes, with orjson when it is available."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode("utf-8")
+
+def _decode_json(text):
+    """Parse JSON text (str or bytes), with orjson when it is available."""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+def _write_snapshot(chunks, output_file: str, compression=None) -> None:
+    """
+    Write the encoded snapshot chunks to output_file, optionally compressed
+    ("gzip" at level 1, "zstd" at level 3). Both levels keep compression cheap
+    while still shrinking the repetitive JSON several times.
+    The data goes to a unique temp file that is fsynced and then renamed over output_file,
+    so /local/ downloads (or a crash mid-export) never leave a truncated snapshot.
+    Blocking; run it in the executor, never on the event loop.
+    """
+    out_dir = os.path.dirname(output_file)
+    # A unique, hidden temp file per export: concurrent exports never share it,
+    # and a half-written snapshot is not offered under its own /local/ name
+    try:
+        fd, tmp_file = tempfile.mkstemp(dir=out_dir, prefix=".", suffix=".tmp")
+    except FileNotFoundError:
+        # Only the first export (or one after www/ was removed) pays for the mkdir
+        os.makedirs(out_dir, exist_ok=True)
+        fd, tmp_file = tempfile.mkstemp(dir=out_dir, prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb", buffering=_WRITE_BUFFER_SIZE) as f:
+            if compression == COMPRESSION_GZIP:
+                # Imported lazily: only needed when compression was asked for
+                import gzip
+
+                # Name the gzip member after the published file, not the temp file
+                with gzip.GzipFile(
+                    filename=os.path.basename(output_file),
+                    mode="wb",
+                    compresslevel=1,
+                    fileobj=f
+                ) as gz:
+                    gz.writelines(chunks)
+            elif compression == COMPRESSION_ZSTD:
+                try:
+                    import zstandard
+                except ImportError as err:
+                    raise RuntimeError(
+                        "Writing .zst snapshots requires the 'zstandard' Python package."
+                    ) from err
+                with zstandard.ZstdCompressor(level=3).stream_writer(f, closefd=False) as zw:
+                    for chunk in chunks:
+                        zw.write(chunk)
+            else:
+                f.writelines(chunks)
+            # Make sure the data is on disk before the rename publishes it
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates the file 0600: keep the mode of the snapshot being
+        # replaced, or what open() would have given a new file
+        try:
+            mode = os.stat(output_file).st_mode & 0o777
+        except FileNotFoundError:
+            mode = _SNAPSHOT_FILE_MODE
+        os.chmod(tmp_file, mode)
+        os.replace(tmp_file, output_file)
+    except BaseException:
+        try:
+            os.remove(tmp_file)
+        except OSError:
+            pass
+        raise
+
+async def _async_snapshot_chunks(
+    hass: HomeAssistant,
+    skip_nameless=True,
+    include_disabled=False,
+    export_format=EXPORT_FORMAT_JSON
+) -> tuple:
+    """
+    Returns the encoded snapshot as a tuple of byte chunks, cached until a registry changes.
+    Writers stream the chunks straight to disk, so the payload is never joined into one copy.
+    """
+    encoder = _SNAPSHOT_ENCODERS.get(export_format)
+    if encoder is None:
+        raise ValueError(f"Unsupported export format: {export_format}")
+
+    cache = hass.data.setdefault(DATA_EXPORT_CACHE, {})
+    cache_key = (export_format, skip_nameless, include_disabled)
+    chunks = cache.get(cache_key)
+    if chunks is not None:
+        _LOGGER.debug("Registries unchanged; reusing cached snapshot.")
+        return chunks
+
+    # Only the registry copy happens on the event loop; grouping, building
+    # the output and encoding it all run in the executor.
+    registries = _copy_registries(hass)
+    chunks = await hass.async_add_executor_job(
+        _plan_and_encode,
+        encoder,
+        registries,
+        skip_nameless,
+        include_disabled
+    )
+    cache[cache_key] = chunks
+    return chunks
+
 def gather_ha_data(hass, skip_nameless=True, include_disabled=False) -> dict:
     """
     Returns a floors->areas->devices->entities structure, e.g.:
@@ -311,83 +515,172 @@ def gather_ha_data(hass, skip_nameless=True, include_disabled=False) -> dict:
       ]
     }
     """
-    device_registry = async_device_registry(hass)
-    entity_registry = async_entity_registry(hass)
-    area_registry = async_area_registry(hass)
+    plan = _plan_snapshot(_copy_registries(hass), skip_nameless, include_disabled)
+    return _snapshot_dict(_snapshot_metadata(skip_nameless, include_disabled), plan)
 
-    # We'll create one "Default Floor" to hold all areas.
-    floor_data = {
-        "floor_id": "floor_1",
-        "name": "Default Floor",
-        "areas": []
+def _snapshot_dict(metadata: dict, plan: list) -> dict:
+    """Build the full nested snapshot dict from a plan (see gather_ha_data)."""
+    return {
+        "export_metadata": metadata,
+        "floors": [{
+            "floor_id": FLOOR_ID,
+            "name": FLOOR_NAME,
+            "areas": [
+                {
+                    "area_id": area_id,
+                    "name": area_name,
+                    "devices": [_device_block(*dev) for dev in devices]
+                }
+                for area_id, area_name, devices in plan
+            ]
+        }]
+    }
+
+def _snapshot_metadata(skip_nameless, include_disabled) -> dict:
+    """The export_metadata block recorded at the top of every snapshot."""
+    return {
+        "generated_by": "HA Snapshot",
+        "skip_nameless_devices": skip_nameless,
+        "include_disabled_entities": include_disabled
     }
 
-    area_map = {}
+def _copy_registries(hass) -> tuple:
+    """
+    Shallow-copy the area, device and entity registries. Must run on the event loop.
+    Registry entries are immutable (updates replace them), so the copies can be
+    walked from the executor even while the live registries keep changing.
+    """
+    return (
+        list(async_area_registry(hass).areas.items()),
+        list(async_device_registry(hass).devices.items()),
+        list(async_entity_registry(hass).entities.values())
+    )
 
-    # Initialize map of area_id -> dict
-    for ar_id, area in area_registry.areas.items():
-        area_map[ar_id] = {
-            "area_id": ar_id,
-            "name": area.name,
-            "devices": []
-        }
-    # Unassigned area for devices that have no area_id
-    area_map["unassigned"] = {
-        "area_id": "unassigned",
-        "name": "Unassigned",
-        "devices": []
+def _plan_and_encode(encoder, registries: tuple, skip_nameless, include_disabled) -> tuple:
+    """Plan and encode a snapshot from copied registries. Blocking; run it in the executor."""
+    plan = _plan_snapshot(registries, skip_nameless, include_disabled)
+    return encoder(_snapshot_metadata(skip_nameless, include_disabled), plan)
+
+def _plan_snapshot(registries: tuple, skip_nameless=True, include_disabled=False) -> list:
+    """
+    Group registry entries into the export layout without building any output dicts.
+    Takes the (areas, devices, entities) copies made by _copy_registries.
+    Returns [(area_id, area_name, [(device_id, device, entities), ...]), ...] in export order.
+    """
+    areas, devices, entities = registries
+
+    # Initialize map of area_id -> (area_id, name, devices)
+    area_map = {
+        ar_id: (ar_id, area.name, [])
+        for ar_id, area in areas
     }
+    # Unassigned area for devices that have no area_id
+    area_map["unassigned"] = ("unassigned", "Unassigned", [])
+
+    unassigned_block = area_map["unassigned"]
+
+    # Index entities by device in a single pass.
+    # Device-less entities (helpers, automations, ...) are never looked up.
+    by_device = defaultdict(list)
+    for e in entities:
+        if e.device_id and (include_disabled or not e.disabled_by):
+            by_device[e.device_id].append(e)
 
-    # Process devices
-    for dev_id, device in device_registry.devices.items():
+    # Process devices (lookups bound to locals for the hot loop)
+    area_get = area_map.get
+    entities_get = by_device.get
+    for dev_id, device in devices:
         if skip_nameless and (not device.name or not device.manufacturer):
             continue
 
-        a_id = device.area_id or "unassigned"
-        if a_id not in area_map:
-            a_id = "unassigned"
-        area_block = area_map[a_id]
+        # Devices with no (or an unknown) area_id land in "Unassigned"
+        area_block = area_get(device.area_id, unassigned_block)
 
-        # Gather entities for this device
-        try:
-            dev_entities = entity_registry.async_entries_for_device(
-                dev_id,
-                include_disabled_entities=include_disabled
-            )
-        except AttributeError:
-            # Fallback for older HA
-            dev_entities = [
-                e for e in entity_registry.entities.values()
-                if e.device_id == dev_id
-                and (include_disabled or not e.disabled_by)
-            ]
+        area_block[2].append((dev_id, device, entities_get(dev_id, ())))
 
-        ent_list = []
-        for e in dev_entities:
-            ent_list.append({
-                "entity_id": e.entity_id,
-                "name": e.name or "",
-                "domain": e.entity_id.split(".")[0],
-                # If "labels" exist in the entity options, retrieve them
-                "labels": e.options.get(DOMAIN, {}).get("labels", []),
-                "disabled": bool(e.disabled_by)
-            })
-
-        area_block["devices"].append({
-            "device_id": dev_id,
-            "name": device.name,
-            "manufacturer": device.manufacturer,
-            "model": device.model,
-            "entities": ent_list
-        })
-
-    floor_data["areas"] = list(area_map.values())
+    # Areas without any exported device (often "Unassigned") are left out
+    return [block for block in area_map.values() if block[2]]
+
+def _entity_labels(options, no_labels=None):
+    """
+    Return the "labels" stored in our own entity options, or no_labels
+    (a fresh empty list when no_labels is None) if there are none.
+    """
+    own_opts = options.get(DOMAIN)
+    if own_opts and "labels" in own_opts:
+        return own_opts["labels"]
+    return [] if no_labels is None else no_labels
+
+def _device_block(dev_id, device, dev_entities, no_labels=None) -> dict:
+    """
+    Build the exported dict for one device and its entities.
+    no_labels is used for entities without labels (see _entity_labels).
+    """
+    ent_list = [
+        {
+            "entity_id": entity_id,
+            "name": name or "",
+            "domain": entity_id.partition(".")[0],
+            # If "labels" exist in the entity options, retrieve them
+            "labels": _entity_labels(options, no_labels),
+            "disabled": bool(disabled_by)
+        }
+        for entity_id, name, options, disabled_by in map(_ENTITY_GETTER, dev_entities)
+    ]
 
     return {
-        "export_metadata": {
-            "generated_by": "HA Snapshot",
-            "skip_nameless_devices": skip_nameless,
-            "include_disabled_entities": include_disabled
-        },
-        "floors": [floor_data]
+        "device_id": dev_id,
+        "name": device.name,
+        "manufacturer": device.manufacturer,
+        "model": device.model,
+        "entities": ent_list
     }
+
+def _iter_snapshot_json(metadata: dict, plan: list):
+    """
+    Yield the snapshot as JSON byte fragments, encoding one device at a time.
+    The output is byte-for-byte what _encode_json(gather_ha_data(...)) produces,
+    but only a single device dict is alive at any point instead of the whole tree.
+    """
+    enc = _encode_json
+    device_block = _device_block
+    yield (
+        b'{"export_metadata":' + enc(metadata)
+        + b',"floors":[{"floor_id":' + enc(FLOOR_ID)
+        + b',"name":' + enc(FLOOR_NAME)
+        + b',"areas":['
+    )
+    for i, (area_id, area_name, devices) in enumerate(plan):
+        yield (
+            (b',{"area_id":' if i else b'{"area_id":') + enc(area_id)
+            + b',"name":' + enc(area_name)
+            + b',"devices":['
+        )
+        for j, dev in enumerate(devices):
+            if j:
+                yield b','
+            yield enc(device_block(*dev, _NO_LABELS))
+        yield b']}'
+    yield b']}]}'
+
+def _encode_snapshot(metadata: dict, plan: list) -> tuple:
+    """Encode a planned snapshot to JSON byte chunks. Blocking; run it in the executor."""
+    return tuple(_iter_snapshot_json(metadata, plan))
+
+def _encode_snapshot_msgpack(metadata: dict, plan: list) -> tuple:
+    """
+    Encode a planned snapshot to msgpack (as a single chunk).
+    Blocking; run it in the executor.
+    """
+    try:
+        import msgpack
+    except ImportError as err:
+        raise RuntimeError(
+            "The msgpack export format requires the 'msgpack' Python package."
+        ) from err
+    return (msgpack.packb(_snapshot_dict(metadata, plan), use_bin_type=True),)
+
+_SNAPSHOT_ENCODERS = {
+    EXPORT_FORMAT_JSON: _encode_snapshot,
+    EXPORT_FORMAT_MSGPACK: _encode_snapshot_msgpack
+}
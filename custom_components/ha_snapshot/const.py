@@ -7,6 +7,21 @@ DOMAIN = "ha_snapshot"
 SERVICE_EXPORT_DATA = "export_data"
 SERVICE_IMPORT_DATA = "import_data"
 
+# Output formats accepted by the export_data service
+EXPORT_FORMAT_JSON = "json"
+EXPORT_FORMAT_MSGPACK = "msgpack"
+
+# Compression applied to the written snapshot file
+COMPRESSION_GZIP = "gzip"
+COMPRESSION_ZSTD = "zstd"
+
+# hass.data key for cached export payloads (kept apart from per-entry options)
+DATA_EXPORT_CACHE = f"{DOMAIN}_export_cache"
+
+# All areas are exported under a single default floor
+FLOOR_ID = "floor_1"
+FLOOR_NAME = "Default Floor"
+
 DEFAULT_SKIP_NAMELESS_DEVICES = True
 DEFAULT_INCLUDE_DISABLED_ENTITIES = False
 
@@ -23,6 +23,7 @@ class HaSnapshotPanel extends LitElement {
       _statusMessage: { type: String },
       _filename: { type: String },
       _notifyExport: { type: Boolean },
+      _compressExport: { type: Boolean },
       _notifyImport: { type: Boolean },
       _importFileContent: { type: String }
     };
@@ -33,6 +34,7 @@ class HaSnapshotPanel extends LitElement {
     this._statusMessage = "";
     this._filename = "ha_snapshot_data.json";
     this._notifyExport = true;
+    this._compressExport = false;
     this._notifyImport = true;
     this._importFileContent = "";
   }
@@ -96,6 +98,13 @@ class HaSnapshotPanel extends LitElement {
           ></mwc-checkbox>
         </mwc-formfield>
 
+        <mwc-formfield label="Compress (gzip)?">
+          <mwc-checkbox
+            ?checked=${this._compressExport}
+            @change=${(e) => this._compressExport = e.target.checked}
+          ></mwc-checkbox>
+        </mwc-formfield>
+
         <div class="actions">
           <mwc-button outlined label="Export Now" icon="file_download" @click=${this._exportNow}></mwc-button>
         </div>
@@ -133,7 +142,8 @@ class HaSnapshotPanel extends LitElement {
     this._setStatus("Exporting snapshot...");
     this.hass.callService("ha_snapshot", "export_data", {
       filename: this._filename,
-      notify: this._notifyExport
+      notify: this._notifyExport,
+      compress: this._compressExport
     })
     .then(() => {
       this._setStatus("Export request sent! Check notifications if 'notify' was selected.");